@@ -2,20 +2,28 @@ import os
 import asyncio
 import re
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from slack_bolt.async_app import AsyncApp
 from slack_bolt.adapter.socket_mode import SocketModeHandler
 from slack_bolt.adapter.socket_mode.aiohttp import AsyncSocketModeHandler
-from modules.k8s_utils.k8s_utils import KubernetesUtils
+from modules.k8s_utils.k8s_utils import KubernetesUtils, NO_RUNNING_PODS_MESSAGE
 from modules.bot_utils.bot_utils import get_logs_help_message, get_version_help_message, parse_user_input
 from modules.sensitive_data_censors.trufflehog_scan import TruffleHogCensor
 from modules.sensitive_data_censors.perediso_scan import SensitiveDataCensor
 
+# uvloop is not available on every platform, fall back to the default asyncio loop
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 # Set up logging configuration
 log_level = os.getenv('LOG_LEVEL', 'INFO').upper()
 logging.basicConfig(level=getattr(logging, log_level, logging.INFO))
 
 APPLICATION_LABEL_SELECTOR_KEY = os.getenv('APPLICATION_LABEL_SELECTOR_KEY', 'app.kubernetes.io/name')
 APPLICATION_VERSION_URL = os.getenv('APPLICATION_VERSION_URL', '/version')
+TRUFFLEHOG_BINARY_SCAN = os.getenv('TRUFFLEHOG_BINARY_SCAN', 'false').lower() == 'true'
                                                      
 SLACK_BOT_TOKEN = os.environ['SLACK_BOT_TOKEN']
 if not SLACK_BOT_TOKEN:
@@ -27,6 +35,12 @@ if not SLACK_APP_TOKEN:
 # Set default value of log lines to fetch from a service
 DEFAULT_LOG_LINES = 10
 
+# Slack accepts at most 5 responses per command response_url
+SLACK_MAX_RESPONSES = 5
+
+# Size of the thread pool running the blocking Kubernetes client calls
+KUBERNETES_CLIENT_WORKERS = 32
+
 # Initialize KubeServiceInfo
 kube_utils = KubernetesUtils(application_label_selector_key=APPLICATION_LABEL_SELECTOR_KEY, app_version_url=APPLICATION_VERSION_URL)
 
@@ -35,12 +49,12 @@ app = AsyncApp(token=SLACK_BOT_TOKEN)
 
 # Initialize sensitive data scanners
 sensitive_data_scanner = SensitiveDataCensor()
-credentials_data_scanner = TruffleHogCensor()
+credentials_data_scanner = TruffleHogCensor(use_trufflehog_binary=TRUFFLEHOG_BINARY_SCAN)
 
 
-def censor_data(data):  
+def _censor_data(data):
     """
-    Censors sensitive data from the logs.
+    Runs the credentials scanner followed by the sensitive data scanner over the logs.
 
     Args:
         data (str): The log data to be censored.
@@ -48,9 +62,23 @@ def censor_data(data):
     Returns:
         str: The censored log data with sensitive information removed.
     """
-    censored_data = credentials_data_scanner.censor_data(data) if data else data
-    censored_data = sensitive_data_scanner.censor_sensitive_data(censored_data) if censored_data else data
-    return censored_data
+    censored_data = credentials_data_scanner.censor_data(data)
+    return sensitive_data_scanner.censor_sensitive_data(censored_data) if censored_data else censored_data
+
+async def censor_data(data):  
+    """
+    Censors sensitive data from the logs without blocking the event loop.
+
+    Args:
+        data (str): The log data to be censored.
+    
+    Returns:
+        str: The censored log data with sensitive information removed.
+    """
+    # Nothing to censor in empty output or the bot's own message about missing pods
+    if not data or data.startswith(NO_RUNNING_PODS_MESSAGE):
+        return data
+    return await asyncio.to_thread(_censor_data, data)
 
 async def get_services_info(label_selector, namespace):
     """
@@ -73,26 +101,24 @@ async def get_services_info(label_selector, namespace):
 
 async def get_service_logs(label_selector, namespace, lines=10):
     """
-    Fetches logs of a Kubernetes service and censors sensitive data.
+    Fetches logs of a Kubernetes service and censors sensitive data, pod by pod as the logs arrive.
 
     Args:
         label_selector (str): A label selector to filter the service.
         namespace (str): The namespace of the service.
         lines (int): Number of log lines to fetch (default is 10).
     
-    Returns:
-        str: The censored logs of the specified service.
+    Yields:
+        str: The censored logs of one or more pods of the specified service.
     """
     # Call the async method to get Kubernetes service information
     try:
-        logs =  await kube_utils.get_service_logs(label_selector=label_selector, namespace=namespace, lines=lines) 
-        #Censore all sensitive data from logs
-        censored_logs = censor_data(logs)
-        
-        return censored_logs
+        async for logs in kube_utils.stream_service_logs(label_selector=label_selector, namespace=namespace, lines=lines):
+            #Censore all sensitive data from logs
+            yield await censor_data(logs)
     except Exception as e:
         logging.error(f"Error retrieving service logs: {str(e)}")
-        return("Error retrieving service logs")
+        yield "Error retrieving service logs"
     
 
 @app.command('/version')
@@ -173,16 +199,33 @@ async def handle_logs_request(ack, body, respond):
             if not service:
                 await respond("Error: 'service' is required when retrieving logs. Use --help to get the bot manual")
             else:
-                service_logs = await get_service_logs(service, namespace, log_lines)
-                logging.info(f"Service Logs: {service_logs}")
-                await respond(service_logs)
+                # Send the logs as they arrive, keeping the last allowed response for whatever is left
+                responses_sent = 0
+                remaining_logs = []
+                async for service_logs in get_service_logs(service, namespace, log_lines):
+                    logging.info(f"Service Logs: {service_logs}")
+                    if responses_sent < SLACK_MAX_RESPONSES - 1:
+                        await respond(service_logs)
+                        responses_sent += 1
+                    else:
+                        remaining_logs.append(service_logs)
+
+                if remaining_logs:
+                    await respond("\n".join(remaining_logs))
     except Exception as e:
         logging.error(f"Error handling /logs request: {str(e)}")
         await respond("An error occurred while processing the /logs request.")
     
 async def main():
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=KUBERNETES_CLIENT_WORKERS))
     handler = AsyncSocketModeHandler(app, os.environ["SLACK_APP_TOKEN"])
-    await handler.start_async()
+    try:
+        await handler.start_async()
+    finally:
+        await kube_utils.aclose()
     
 if __name__ == "__main__":
-    asyncio.run(main())
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
@@ -1,5 +1,10 @@
 import re
 
+# Regular expression to match key-value pairs (key=value)
+_KV_RE = re.compile(r'(\w+)=(\S+)')
+# Regular expression to match flags (like --logs or --help)
+_FLAG_RE = re.compile(r'(--\w+)')
+
 def get_version_help_message(label_selector):
     """
     Returns a help message with usage instructions for retrieving service version information.
@@ -69,18 +74,13 @@ def parse_user_input(user_input):
     # Removes the @<user_name> from the user input payload
     # payload = user_input.split(' ', 1)[1] if ' ' in user_input else ''
     payload = user_input
-    
-   # Regular expression to match key-value pairs (key=value)
-    key_value_pattern = r'(\w+)=([^\s]+)'  # Match key=value pairs
-    # Regular expression to match flags (like --logs or --help)
-    flag_pattern = r'(--\w+)'
 
     # Parse the key-value pairs into a dictionary
-    parsed_values = {match[0]: match[1] for match in re.findall(key_value_pattern, payload)}
+    parsed_values = {match[0]: match[1] for match in _KV_RE.findall(payload)}
     
     # Parse optional flags
-    flags = re.findall(flag_pattern, payload)
-    parsed_values['help'] = "--help" in payload  # Boolean flag for help
+    flags = {flag[2:] for flag in _FLAG_RE.findall(payload)}
+    parsed_values['help'] = 'help' in flags  # Boolean flag for help
     
     return parsed_values
     
\ No newline at end of file
@@ -1,13 +1,44 @@
 import asyncio
+import functools
+from collections import Counter
 import aiohttp
 from kubernetes import client, config
 from datetime import datetime, timezone
 import logging
-import os
+import time
 
-# Get logging level from environment variable, default to INFO if not set
-log_level = os.getenv('LOG_LEVEL', 'INFO').upper()
-logging.basicConfig(level=getattr(logging, log_level, logging.INFO))
+# Logging is configured by the application, this module only emits records
+logger = logging.getLogger(__name__)
+
+# How long pod and EndpointSlice listings are reused before querying the API server again
+CACHE_TTL_SECONDS = 5.0
+
+# Maximum number of concurrent /version requests, also used as the connection pool size
+MAX_CONCURRENT_VERSION_REQUESTS = 32
+
+# Pods whose logs arrive within this window of each other are sent to Slack as one message
+LOG_BATCH_WINDOW_SECONDS = 0.05
+
+# Timeout for the single /version request through a Service VIP, kept short as the pods are queried on failure
+SERVICE_VERSION_TIMEOUT_SECONDS = 1
+
+NO_RUNNING_PODS_MESSAGE = "No running pods found for the specified service."
+
+@functools.lru_cache(maxsize=256)
+def _build_selector(key, value):
+    """
+    Constructs a label selector from a label key and a user-provided value.
+
+    Parameters:
+        key (str): The label key identifying the application.
+        value (str): The value to use with the label selector.
+
+    Returns:
+        str: The constructed label selector, or an empty string when no value is given.
+    """
+    if not value:
+        return ''
+    return f"{key}={value}"
 
 class KubernetesUtils:
     def __init__(self, application_label_selector_key, app_version_url):
@@ -17,36 +48,75 @@ class KubernetesUtils:
             self.v1_endpoint_slice = client.DiscoveryV1Api()  # For EndpointSlice API
             self.application_label_selector_key = application_label_selector_key
             self.app_version_url = app_version_url
+            # Shared HTTP session and request limiter, created lazily so they bind to the running event loop
+            self.session = None
+            self._version_sem = None
+            # Short-lived caches of API server listings, keyed by their query
+            self._pods_cache = {}
+            self._endpoint_slices_cache = {}
+            self._services_cache = {}
         except Exception as e:
-            logging.error(f"Error initialize KubernetesUtils: {str(e)}")
+            logger.error(f"Error initialize KubernetesUtils: {str(e)}")
     
     def __load_kubernetes_config(self):
         try:
             config.load_incluster_config()
-            logging.info("Successfully loaded Kubernetes configuration from within the cluster.")
+            logger.info("Successfully loaded Kubernetes configuration from within the cluster.")
         except config.ConfigException:
             config.load_kube_config()
-            logging.info("Kubernetes configuration loaded from local kubeconfig file.")
+            logger.info("Kubernetes configuration loaded from local kubeconfig file.")
+
 
+    def __get_session(self):
+        """
+        Returns the shared aiohttp session, creating it on first use so connections are pooled across requests.
 
-    def __construct_label_selector(self, label_selector_value):
+        Returns:
+            aiohttp.ClientSession: The shared HTTP session.
+        """
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=MAX_CONCURRENT_VERSION_REQUESTS, limit_per_host=0, ttl_dns_cache=300)
+            self.session = aiohttp.ClientSession(connector=connector)
+            self._version_sem = asyncio.Semaphore(MAX_CONCURRENT_VERSION_REQUESTS)
+        return self.session
+
+    async def aclose(self):
+        """Closes the shared HTTP session, if one was opened."""
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    def __get_cached(self, cache, key):
         """
-        Constructs a label selector using the class property and user-provided value.
+        Returns a cached API server listing if it is younger than CACHE_TTL_SECONDS.
 
         Parameters:
-            user_input_value (str): The value to use with the label selector.
+            cache (dict): The cache to look in.
+            key (tuple): The query the listing was fetched for.
 
         Returns:
-            str: The constructed label selector.
+            list: The cached items, or None if missing or expired.
         """
-        if not label_selector_value:
-            return ''
-        else:
-            label_selector = f"{self.application_label_selector_key}={label_selector_value}"
-            logging.info(f"Constructed label selector: {label_selector}")
-            return label_selector
-
-    def __get_running_pods(self, namespace, label_selector):
+        entry = cache.get(key)
+        if entry and time.monotonic() - entry[0] < CACHE_TTL_SECONDS:
+            return entry[1]
+        return None
+
+    def __set_cached(self, cache, key, items):
+        """
+        Stores an API server listing in the cache and drops expired entries.
+
+        Parameters:
+            cache (dict): The cache to store in.
+            key (tuple): The query the listing was fetched for.
+            items (list): The fetched items.
+        """
+        now = time.monotonic()
+        for expired_key in [k for k, (timestamp, _) in cache.items() if now - timestamp >= CACHE_TTL_SECONDS]:
+            del cache[expired_key]
+        cache[key] = (now, items)
+
+    async def __get_running_pods(self, namespace, label_selector):
         """
         Retrieves a list of all running pods in the specified namespace and label selector.
         
@@ -58,12 +128,18 @@ class KubernetesUtils:
             list: A list of dictionaries with pod name, uptime, and IP.
         """
         try:
-            field_selector = "status.phase=Running"
-            full_label_selector = self.__construct_label_selector(label_selector)
-            pod_list = self.v1.list_namespaced_pod(namespace=namespace, label_selector=full_label_selector, field_selector=field_selector)
+            cache_key = (namespace, label_selector)
+            pods = self.__get_cached(self._pods_cache, cache_key)
+            if pods is None:
+                field_selector = "status.phase=Running"
+                full_label_selector = _build_selector(self.application_label_selector_key, label_selector)
+                logger.debug("Constructed label selector: %s", full_label_selector)
+                pod_list = await asyncio.to_thread(self.v1.list_namespaced_pod, namespace=namespace, label_selector=full_label_selector, field_selector=field_selector)
+                pods = pod_list.items
+                self.__set_cached(self._pods_cache, cache_key, pods)
             running_pods = []
 
-            for pod in pod_list.items:
+            for pod in pods:
                 creation_time = pod.metadata.creation_timestamp
                 uptime_str = self.__calculate_uptime(creation_time)
 
@@ -71,18 +147,62 @@ class KubernetesUtils:
                     'name': pod.metadata.name,
                     'namespace': pod.metadata.namespace,
                     'ip': pod.status.pod_ip,
-                    'uptime': uptime_str
+                    'uptime': uptime_str,
+                    'revision': self.__get_pod_revision(pod)
                 })
 
-            logging.info(f"Retrieved {len(running_pods)} running pods.")
+            logger.debug("Retrieved %d running pods.", len(running_pods))
             return running_pods
         except client.ApiException as e:
-            logging.error(f"Error fetching running pods: {str(e)}")
+            logger.error(f"Error fetching running pods: {str(e)}")
             return []
         except Exception as e:
-            logging.error(f"Unexpected error while fetching running pods: {str(e)}")
+            logger.error(f"Unexpected error while fetching running pods: {str(e)}")
             return []
 
+    def __get_pod_revision(self, pod):
+        """
+        Identifies the revision a pod was created from, pods sharing a revision run the same version.
+
+        Parameters:
+            pod (V1Pod): The pod object returned by the API server.
+
+        Returns:
+            tuple: The controller revision hash label and the container images of the pod.
+        """
+        labels = pod.metadata.labels or {}
+        revision_hash = labels.get('pod-template-hash') or labels.get('controller-revision-hash') or ''
+        images = tuple(container.image for container in pod.spec.containers or [])
+        return (revision_hash, images)
+
+    async def __get_service_address(self, namespace, service_name):
+        """
+        Retrieves the ClusterIP and port of a Service.
+
+        Parameters:
+            namespace (str): The namespace of the Service.
+            service_name (str): The name of the Service.
+
+        Returns:
+            tuple: The ClusterIP and port of the Service, or None if it has no virtual IP or more than one port.
+        """
+        try:
+            cache_key = (namespace, service_name)
+            services = self.__get_cached(self._services_cache, cache_key)
+            if services is None:
+                service = await asyncio.to_thread(self.v1.read_namespaced_service, name=service_name, namespace=namespace)
+                services = [service]
+                self.__set_cached(self._services_cache, cache_key, services)
+
+            spec = services[0].spec
+            # Headless Services have no virtual IP to query through
+            if not spec.cluster_ip or spec.cluster_ip == 'None' or len(spec.ports or []) != 1:
+                return None
+            return (spec.cluster_ip, spec.ports[0].port)
+        except Exception as e:
+            logger.error(f"Error fetching Service {service_name}: {str(e)}")
+            return None
+
     def __calculate_uptime(self, creation_time):
         """Calculates the uptime of a pod based on its creation time."""
         if creation_time:
@@ -90,25 +210,37 @@ class KubernetesUtils:
             return str(uptime).split('.')[0]  # Format uptime as a string
         return "Unknown"
 
-    def __get_endpoint_slices(self, namespace):
+    async def __get_endpoint_slices(self, namespace, label_selector):
         """
         Retrieves EndpointSlices in the specified namespace.
         
         Parameters:
             namespace (str): The namespace to search for EndpointSlices. Defaults to 'default'.
+            label_selector (str): Optional service name, used to let the API server return only that service's EndpointSlices.
         
         Returns:
             list: A list of EndpointSlice objects.
         """
         try:
-            endpoint_slices = self.v1_endpoint_slice.list_namespaced_endpoint_slice(namespace)
-            logging.info(f"Retrieved {len(endpoint_slices.items)} EndpointSlices.")
-            return endpoint_slices.items
+            service_selector = f"kubernetes.io/service-name={label_selector}" if label_selector else ''
+            cache_key = (namespace, service_selector)
+            endpoint_slices = self.__get_cached(self._endpoint_slices_cache, cache_key)
+            if endpoint_slices is None:
+                endpoint_slice_list = await asyncio.to_thread(self.v1_endpoint_slice.list_namespaced_endpoint_slice, namespace, label_selector=service_selector)
+                endpoint_slices = endpoint_slice_list.items
+                self.__set_cached(self._endpoint_slices_cache, cache_key, endpoint_slices)
+
+            # The Service may be named differently than the application label, fall back to all EndpointSlices
+            if not endpoint_slices and service_selector:
+                return await self.__get_endpoint_slices(namespace, '')
+
+            logger.debug("Retrieved %d EndpointSlices.", len(endpoint_slices))
+            return endpoint_slices
         except client.ApiException as e:
-            logging.error(f"Error fetching EndpointSlices: {str(e)}")
+            logger.error(f"Error fetching EndpointSlices: {str(e)}")
             return []
         except Exception as e:
-            logging.error(f"Unexpected error while fetching EndpointSlices: {str(e)}")
+            logger.error(f"Unexpected error while fetching EndpointSlices: {str(e)}")
             return []
 
     def __filter_endpoints_by_running_pods(self, running_pods, endpoint_slices):
@@ -120,34 +252,42 @@ class KubernetesUtils:
             endpoint_slices (list): List of EndpointSlice objects.
 
         Returns:
-            list: Filtered endpoints containing valid pod IPs, ports, and their names.
+            tuple: Filtered endpoints containing valid pod IPs, ports, and their names, and the ready addresses
+                of each Service keyed by its namespace and name.
         """
         try:
-            valid_pod_ips = {pod['ip'] for pod in running_pods}  # Set of IPs from running pods
+            pod_ip_to_info = {pod['ip']: pod for pod in running_pods}
             filtered_endpoints = []
-            pod_ip_to_info = {pod['ip']: {'name': pod['name'], 'uptime': pod['uptime'], 'namespace': pod['namespace']} for pod in running_pods}
+            service_addresses = {}
 
             for endpoint_slice in endpoint_slices:
-                for endpoint in endpoint_slice.endpoints:
-                    if endpoint.addresses:  # Ensure there are addresses
-                        for address in endpoint.addresses:
-                            if address in valid_pod_ips:
-                                for port in endpoint_slice.ports:
-                                    pod_info = pod_ip_to_info.get(address, {"name": "Unknown Pod", "uptime": "Unknown"})
-                                    filtered_endpoints.append({
-                                        'name': pod_info['name'],
-                                        'namespace': pod_info['namespace'],
-                                        'ip': address,
-                                        'port': port.port,
-                                        'uptime': pod_info['uptime']
-                                    })
-
-            return filtered_endpoints
+                ports = [port.port for port in endpoint_slice.ports or []]
+                service_name = (endpoint_slice.metadata.labels or {}).get('kubernetes.io/service-name', '')
+                ready_addresses = service_addresses.setdefault((endpoint_slice.metadata.namespace, service_name), set())
+                for endpoint in endpoint_slice.endpoints or []:
+                    # An unknown ready condition is treated as ready, the Service routes to such endpoints
+                    if endpoint.conditions is None or endpoint.conditions.ready is not False:
+                        ready_addresses.update(endpoint.addresses or [])
+                    for address in endpoint.addresses or []:
+                        pod_info = pod_ip_to_info.get(address)
+                        if pod_info is None:
+                            continue
+                        filtered_endpoints.extend({
+                            'name': pod_info['name'],
+                            'namespace': pod_info['namespace'],
+                            'ip': address,
+                            'port': port,
+                            'uptime': pod_info['uptime'],
+                            'revision': pod_info['revision'],
+                            'service': service_name
+                        } for port in ports)
+
+            return filtered_endpoints, service_addresses
         except Exception as e:
-            logging.error(f"Error filtering endpoints by running pods: {str(e)}")
-            return []
+            logger.error(f"Error filtering endpoints by running pods: {str(e)}")
+            return [], {}
 
-    async def __get_service_version(self, session, ip, port):
+    async def __get_service_version(self, session, ip, port, timeout=3):
         """
         Fetches the version of a service from the /version endpoint asynchronously.
 
@@ -155,92 +295,128 @@ class KubernetesUtils:
             session (aiohttp.ClientSession): The aiohttp session to use for requests.
             ip (str): The IP address of the pod.
             port (int): The port to access the /version endpoint.
+            timeout (float): The request timeout in seconds. Defaults to 3.
 
         Returns:
             str: The version of the service or empty string if not retrievable.
         """
         try:
             url = f"http://{ip}:{port}{self.app_version_url}"
-            async with session.get(url, timeout=3) as response:
-                if response.status == 200:
-                    return await response.text()
-                else:
-                    return ""
+            async with self._version_sem:
+                async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                    if response.status == 200:
+                        return await response.text()
+                    else:
+                        return ""
         except Exception as e:
-            logging.error(f"Error fetching version from {ip}:{port}: {str(e)}")
+            logger.error(f"Error fetching version from {ip}:{port}: {str(e)}")
             return ""
 
-    async def __fetch_service_versions(self, filtered_pods):
+    async def __fetch_service_versions(self, filtered_pods, service_addresses):
         """
         Asynchronously fetches service versions for all filtered pods.
 
         Parameters:
-            filtered_pods (list): The filtered pods with their IPs and ports.
+            filtered_pods (list): The filtered pods with their IPs, ports and the Service whose EndpointSlices listed them.
+            service_addresses (dict): The ready addresses of each Service, keyed by its namespace and name.
 
         Returns:
             list: A list of service versions.
         """
-        async with aiohttp.ClientSession() as session:
-            tasks = [self.__get_service_version(session, pod['ip'], pod['port']) for pod in filtered_pods]
-            versions = await asyncio.gather(*tasks)
-            return versions
-
-    async def __get_pod_logs(self, pod_name, lines, namespace):
+        session = self.__get_session()
+
+        # Pods of a single revision that are exactly the pods behind one Service run the same version, and a
+        # single request through the Service is enough. During a rollout the revisions differ, and a Service that
+        # also fronts other pods could answer from one of them, in both cases every pod is queried.
+        services = {(pod['namespace'], pod['service']) for pod in filtered_pods}
+        if (len(filtered_pods) > 1 and len(services) == 1 and len({pod['revision'] for pod in filtered_pods}) == 1
+                and service_addresses.get(next(iter(services))) == {pod['ip'] for pod in filtered_pods}):
+            namespace, service_name = services.pop()
+            service_address = await self.__get_service_address(namespace, service_name) if service_name else None
+            if service_address:
+                version = await self.__get_service_version(session, *service_address, timeout=SERVICE_VERSION_TIMEOUT_SECONDS)
+                if version:
+                    return [version] * len(filtered_pods)
+
+        tasks = [self.__get_service_version(session, pod['ip'], pod['port']) for pod in filtered_pods]
+        versions = await asyncio.gather(*tasks)
+        return versions
+
+    async def __get_pod_logs(self, pod, lines):
         """
         Retrieves the last X lines of logs from a specified pod.
         
         Parameters:
-            pod_name (str): The name of the pod to fetch logs from.
-            namespace (str): The namespace where the pod is located. Defaults to 'default'.
+            pod (dict): The running pod to fetch logs from, as returned by __get_running_pods.
             lines (int): The number of log lines to retrieve.
         
         Returns:
             str: The logs from the pod or an error message.
         """
+        pod_name = pod['name']
         try:
-            if not namespace:
-                self.v1.read_namespaced_pod_log(name=pod_name, namespace=namespace, tail_lines=lines, async_req=True).get()
-            logs = self.v1.read_namespaced_pod_log(name=pod_name, namespace=namespace, tail_lines=lines, async_req=True).get()
-            logging.info(f"Retrieved logs for pod {pod_name}.")
+            # Use the pod's own namespace, the user may not have specified one
+            logs = await asyncio.to_thread(self.v1.read_namespaced_pod_log, name=pod_name, namespace=pod['namespace'], tail_lines=lines)
+            logger.debug("Retrieved logs for pod %s.", pod_name)
             return logs
         except client.ApiException as e:
-            logging.error(f"Error fetching logs for pod {pod_name}: {str(e)}")
+            logger.error(f"Error fetching logs for pod {pod_name}: {str(e)}")
             return f"Error fetching logs for pod {pod_name}: {str(e)}"
         except Exception as e:
-            logging.error(f"Unexpected error while fetching logs for pod {pod_name}: {str(e)}")
+            logger.error(f"Unexpected error while fetching logs for pod {pod_name}: {str(e)}")
             return f"Unexpected error while fetching logs for pod {pod_name}: {str(e)}"
 
-    async def get_service_logs(self, label_selector, namespace, lines):
+    async def stream_service_logs(self, label_selector, namespace, lines):
         """
-        Retrieves the last X lines of logs for all running pods in the service.
+        Retrieves the last X lines of logs for all running pods in the service, yielding them as pods respond.
+
+        Pods whose logs arrive within LOG_BATCH_WINDOW_SECONDS of each other are combined into one message.
 
         Parameters:
             label_selector (str): The label selector to filter the service's pods (e.g., 'app=my-app').
             namespace (str): The namespace where the service and pods are located.
             lines (int): The number of log lines to retrieve for each pod.
         
-        Returns:
-            str: Formatted logs from all pods in the service.
+        Yields:
+            str: Formatted logs of one or more pods, the first message also carries the header.
         """
+        pending = set()
         try:
-            running_pods = self.__get_running_pods(namespace=namespace, label_selector=label_selector)
+            running_pods = await self.__get_running_pods(namespace=namespace, label_selector=label_selector)
 
             if not running_pods:
-                return "No running pods found for the specified service."
-
-            logs_results = await asyncio.gather(*[self.__get_pod_logs(pod_name=pod['name'], lines=lines, namespace=pod['namespace']) for pod in running_pods])
-
-            result_str = f"*Service Logs for {label_selector}. Sensitive data will be censored*\n```"
-            for pod_name, pod_logs in zip([pod['name'] for pod in running_pods], logs_results):
-                result_str += f"\n---- Logs from Pod: {pod_name} ----\n{pod_logs}\n--------------------------------------------\n"
-
-            result_str += "```"  # Close the code block for Slack
-            logging.info("Retrieved service logs successfully.")
-            return result_str
+                yield NO_RUNNING_PODS_MESSAGE
+                return
+
+            tasks = {asyncio.ensure_future(self.__get_pod_logs(pod=pod, lines=lines)): pod for pod in running_pods}
+            pending = set(tasks)
+            header = f"*Service Logs for {label_selector}. Sensitive data will be censored*\n"
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # Give the other pods a short window to finish, so their logs share one message
+                if pending:
+                    batch_done, pending = await asyncio.wait(pending, timeout=LOG_BATCH_WINDOW_SECONDS)
+                    done |= batch_done
+
+                parts = [header, "```"]
+                parts.extend(
+                    f"\n---- Logs from Pod: {pod['name']} ----\n{task.result()}\n--------------------------------------------\n"
+                    for task, pod in tasks.items() if task in done
+                )
+                parts.append("```")  # Close the code block for Slack
+                header = ""
+                yield "".join(parts)
+
+            logger.info("Retrieved service logs successfully.")
         
         except Exception as e:
-            logging.error(f"Error fetching service logs: {str(e)}")
-            return f"Error fetching service logs: {str(e)}"
+            logger.error(f"Error fetching service logs: {str(e)}")
+            yield f"Error fetching service logs: {str(e)}"
+
+        finally:
+            for task in pending:
+                task.cancel()
         
     async def get_services_info(self, label_selector, namespace):        
         """
@@ -254,32 +430,39 @@ class KubernetesUtils:
             str: Formatted string containing information about the services.
         """
         try:
-            running_pods = self.__get_running_pods(namespace=namespace, label_selector=label_selector)
-            endpoint_slices = self.__get_endpoint_slices(namespace=namespace)
-            filtered_pods = self.__filter_endpoints_by_running_pods(running_pods, endpoint_slices)
+            running_pods, endpoint_slices = await asyncio.gather(
+                self.__get_running_pods(namespace=namespace, label_selector=label_selector),
+                self.__get_endpoint_slices(namespace=namespace, label_selector=label_selector)
+            )
+            filtered_pods, service_addresses = self.__filter_endpoints_by_running_pods(running_pods, endpoint_slices)
 
             results = []
             if filtered_pods:
-                versions = await self.__fetch_service_versions(filtered_pods)
+                versions = await self.__fetch_service_versions(filtered_pods, service_addresses)
                 results = [
                     (pod['name'], pod['ip'], pod['uptime'], versions[i] if versions[i] else "Version Unavailable")
                     for i, pod in enumerate(filtered_pods)
                 ]
             else:
-                results.append(("No pods were found.", "", "N/A","N/A", "N/A"))
+                results.append(("No pods were found.", "", "N/A", "N/A"))
             
+            # Count how many pods run each version, a pod listed with several ports is counted once
+            version_counts = Counter(version for _, version in {(name, version) for name, _, _, version in results}) if filtered_pods else Counter()
+            # When every pod reports the same version the summary is enough, the pods are only listed on a mismatch
+            list_pods = not filtered_pods or len(version_counts) > 1 or "Version Unavailable" in version_counts
+
             # Create a formatted string for Slack
-            result_str = "*Kubernetes Pod Information*\n```"
-            result_str += f"{'Pod Name':<35} {'Pod IP':<16} {'Uptime':<20} {'Version':<15}\n" + "-" * 110 + "\n"
-        
-            for name, ip, uptime, version in results:
-                result_str += f"{name:<35} {ip:<16} {uptime:<20} {version:<15}\n"
-            
-            result_str += "```"  # Close the code block
+            parts = ["*Kubernetes Pod Information*\n```"]
+            if list_pods:
+                parts.append(f"{'Pod Name':<35} {'Pod IP':<16} {'Uptime':<20} {'Version':<15}\n" + "-" * 110 + "\n")
+                parts.extend(f"{name:<35} {ip:<16} {uptime:<20} {version:<15}\n" for name, ip, uptime, version in results)
+            if filtered_pods:
+                parts.append(("\n" if list_pods else "") + "Versions: " + ", ".join(f"{version.strip()} ({count} pod{'s' if count != 1 else ''})" for version, count in version_counts.most_common()) + "\n")
+            parts.append("```")  # Close the code block
 
-            return result_str
+            return "".join(parts)
         
         except Exception as e:
-            logging.error(f"Error fetching services information: {str(e)}")
+            logger.error(f"Error fetching services information: {str(e)}")
             raise
 
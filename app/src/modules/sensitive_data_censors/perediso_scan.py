@@ -1,11 +1,55 @@
-from presidio_analyzer import AnalyzerEngine
-from presidio_analyzer.recognizer_registry import recognizer_registry
+from presidio_analyzer import AnalyzerEngine, RecognizerRegistry
+from presidio_analyzer.nlp_engine import NlpArtifacts, NlpEngine, SpacyNlpEngine
 from presidio_anonymizer import AnonymizerEngine
 from presidio_anonymizer.entities import OperatorConfig
 from typing import List
 import logging
+import re
+
+# Small spaCy model, the default large one is far slower to load and run
+SPACY_MODEL = "en_core_web_sm"
+
+# Every default entity contains an '@' or a digit, text without either cannot match
+_PII_CANDIDATE_RE = re.compile(r'[@\d]')
+
+# Entities only detected by spaCy's NER model, all other predefined entities are pattern based
+NLP_ENTITIES = frozenset({"DATE_TIME", "NRP", "LOCATION", "PERSON", "ORGANIZATION"})
+
+class _PatternOnlyNlpEngine(NlpEngine):
+    """NLP engine that returns empty artifacts, so pattern recognizers run without loading a spaCy model."""
+
+    def __init__(self, language: str):
+        self.language = language
+
+    def load(self) -> None:
+        pass
+
+    def is_loaded(self) -> bool:
+        return True
+
+    def process_text(self, text: str, language: str) -> NlpArtifacts:
+        return NlpArtifacts(entities=[], tokens=[], tokens_indices=[], lemmas=[], nlp_engine=None, language=language)
+
+    def process_batch(self, texts, language: str, **kwargs):
+        for text in texts:
+            yield text, self.process_text(text, language)
+
+    def is_stopword(self, word: str, language: str) -> bool:
+        return False
+
+    def is_punct(self, word: str, language: str) -> bool:
+        return False
+
+    def get_supported_entities(self) -> List[str]:
+        return []
+
+    def get_supported_languages(self) -> List[str]:
+        return [self.language]
 
 class SensitiveDataCensor:
+    DEFAULT_ENTITIES = ("CREDIT_CARD", "CRYPTO", "EMAIL_ADDRESS", "IBAN_CODE", "PHONE_NUMBER", "MEDICAL_LICENSE")
+    DEFAULT_REPLACEMENT = "******"
+
     def __init__(self, entities: List[str] = None, language: str = 'en'):
         """
         Initialize the SensitiveDataCensor with specified entities and language.
@@ -14,18 +58,41 @@ class SensitiveDataCensor:
         - entities (List[str]): A list of entities to be detected. Defaults to a predefined set.
         - language (str): The language for analysis. Defaults to 'en'.
         """
-        self.analyzer = AnalyzerEngine()
-        self.anonymizer = AnonymizerEngine()
-        
         # Set default entities if none provided
-        if entities is None:
-            self.entities = ["CREDIT_CARD", "CRYPTO", "EMAIL_ADDRESS", "IBAN_CODE", "PHONE_NUMBER", "MEDICAL_LICENSE"]
-        else:
-            self.entities = entities
-        
+        self.entities = self.DEFAULT_ENTITIES if entities is None else tuple(entities)
         self.language = language
 
-    def censor_sensitive_data(self, text: str, replacement: str = "******") -> str:
+        self.analyzer = self._create_analyzer()
+        self.anonymizer = AnonymizerEngine()
+
+        # Built once, only a custom replacement needs its own operator config
+        self._default_operators = {"DEFAULT": OperatorConfig("replace", {"new_value": self.DEFAULT_REPLACEMENT})}
+
+    def _create_analyzer(self) -> AnalyzerEngine:
+        """
+        Creates the analyzer, loading a spaCy model only if one of the entities requires NER.
+
+        Returns:
+        - AnalyzerEngine: The analyzer for the configured entities and language.
+        """
+        # An empty entity list means all entities, including the NER based ones
+        if not self.entities or NLP_ENTITIES.intersection(self.entities):
+            nlp_engine = SpacyNlpEngine(models=[{"lang_code": "en", "model_name": SPACY_MODEL}])
+            return AnalyzerEngine(nlp_engine=nlp_engine)
+
+        registry = RecognizerRegistry(supported_languages=[self.language])
+        registry.load_predefined_recognizers(languages=[self.language])
+        registry.recognizers = [
+            recognizer for recognizer in registry.recognizers
+            if any(entity in recognizer.supported_entities for entity in self.entities)
+        ]
+        return AnalyzerEngine(
+            registry=registry,
+            nlp_engine=_PatternOnlyNlpEngine(self.language),
+            supported_languages=[self.language]
+        )
+
+    def censor_sensitive_data(self, text: str, replacement: str = DEFAULT_REPLACEMENT) -> str:
         """
         Detects and censors sensitive data from the input string.
 
@@ -37,16 +104,34 @@ class SensitiveDataCensor:
         - str: The text with sensitive data censored.
         """
         try:
+            # Skip the analyzer when the text cannot contain any of the default entities
+            if self.entities == self.DEFAULT_ENTITIES and not _PII_CANDIDATE_RE.search(text):
+                return text
+
             # Analyze the text to detect sensitive data
             results = self.analyzer.analyze(text=text, language=self.language, entities=self.entities)
+            if not results:
+                return text
+            results = sorted(results, key=lambda result: result.start)
+
+            # Overlapping findings need Presidio's conflict resolution, let the anonymizer handle them
+            if any(current.start < previous.end for previous, current in zip(results, results[1:])):
+                if replacement == self.DEFAULT_REPLACEMENT:
+                    operators = self._default_operators
+                else:
+                    operators = {"DEFAULT": OperatorConfig("replace", {"new_value": replacement})}
+                anonymized_text = self.anonymizer.anonymize(text=text, analyzer_results=results, operators=operators)
+                return anonymized_text.text
 
-            # Anonymize (censor) the sensitive data by replacing it with the replacement string
-            anonymized_text = self.anonymizer.anonymize(
-                text=text, 
-                analyzer_results=results, 
-                operators={"DEFAULT": OperatorConfig("replace", {"new_value": replacement})}
-            )
-            return anonymized_text.text
+            # Censor the sensitive data by replacing each detected span with the replacement string
+            parts = []
+            position = 0
+            for result in results:
+                parts.append(text[position:result.start])
+                parts.append(replacement)
+                position = result.end
+            parts.append(text[position:])
+            return "".join(parts)
 
         except Exception as e:
             logging.error(f"Error during censorship: {e}")
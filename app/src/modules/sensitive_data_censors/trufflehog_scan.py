@@ -1,17 +1,108 @@
 import subprocess
 import tempfile
 import os
+import re
 import logging
 
-logging.basicConfig(level=logging.ERROR)
+# Credential formats redacted in-process, without spawning the TruffleHog binary
+AWS_ACCESS_KEY_ID = r'\b(?:AKIA|ASIA|ABIA|ACCA)[0-9A-Z]{16}\b'
+GITHUB_TOKEN = r'\b(?:ghp|gho|ghu|ghs|ghr)_[A-Za-z0-9]{36,255}\b|\bgithub_pat_[A-Za-z0-9_]{82}\b'
+SLACK_TOKEN = r'\bxox[abeoprs]-[A-Za-z0-9-]{10,}'
+SLACK_WEBHOOK = r'https://hooks\.slack\.com/services/[A-Za-z0-9/]+'
+GOOGLE_API_KEY = r'\bAIza[0-9A-Za-z_-]{35}\b'
+STRIPE_KEY = r'\b(?:sk|rk)_live_[0-9A-Za-z]{24,}\b'
+JWT = r'\beyJ[A-Za-z0-9_-]{10,}\.eyJ[A-Za-z0-9_-]{10,}\.[A-Za-z0-9_-]*'
+URL_CREDENTIALS = r'(?<=://)[^/\s:@]+:[^/\s:@]+(?=@)'
+
+# Private keys are matched line by line and at most this many body lines are redacted after a BEGIN line,
+# keeping the scan linear on keys that are cut off or never terminated
+PRIVATE_KEY_MAX_LINES = 256
+# PEM line breaks, either real ones or escaped in JSON formatted logs
+_PEM_LINE_BREAK = r'(?:\r?\n|(?:\\r)?\\n)'
+PRIVATE_KEY_END = r'-----END [A-Z ]{0,40}PRIVATE KEY-----'
+PRIVATE_KEY = (
+    r'-----BEGIN [A-Z ]{0,40}PRIVATE KEY-----'
+    rf'(?:[ \t]*{_PEM_LINE_BREAK}[ \t]*[A-Za-z0-9+/=]+(?=[ \t]*(?:{_PEM_LINE_BREAK}|-----END|$))){{0,{PRIVATE_KEY_MAX_LINES}}}'
+    rf'(?:[ \t]*(?:{_PEM_LINE_BREAK}[ \t]*)?{PRIVATE_KEY_END})?'
+)
+
+_SECRET_PATTERNS = re.compile('|'.join(f'(?:{pattern})' for pattern in [
+    AWS_ACCESS_KEY_ID,
+    GITHUB_TOKEN,
+    SLACK_TOKEN,
+    SLACK_WEBHOOK,
+    GOOGLE_API_KEY,
+    STRIPE_KEY,
+    JWT,
+    PRIVATE_KEY,
+    URL_CREDENTIALS,
+]))
+
+# Body lines in front of an END line whose BEGIN line is missing, as when a log tail starts inside a key
+_PRIVATE_KEY_END_RE = re.compile(PRIVATE_KEY_END)
+_PEM_LINE_BREAK_RE = re.compile(f'({_PEM_LINE_BREAK})')
+_PEM_BODY_LINE_RE = re.compile(r'[ \t]*[A-Za-z0-9+/=]+[ \t]*')
+# PEM body lines are at most 76 characters long, leave room for indentation and escaped line breaks
+_PRIVATE_KEY_BODY_WINDOW = PRIVATE_KEY_MAX_LINES * 128
+
+def _redact_private_key_bodies(content: str) -> str:
+    """
+    Redacts private key END lines together with the base64 body lines right in front of them.
+
+    Parameters:
+        content (str): The string content to redact.
+
+    Returns:
+        str: The content with the remaining private key bodies redacted.
+    """
+    parts = []
+    position = 0
+    for match in _PRIVATE_KEY_END_RE.finditer(content):
+        # Only look back within a bounded window that does not overlap the previous key
+        window_start = max(position, match.start() - _PRIVATE_KEY_BODY_WINDOW)
+        pieces = _PEM_LINE_BREAK_RE.split(content[window_start:match.start()])
+
+        # Pieces alternate between lines and line breaks, walk back over the body lines until anything else
+        body_start = match.start()
+        offset = match.start()
+        for index in range(len(pieces) - 1, -1, -1):
+            offset -= len(pieces[index])
+            if index % 2:
+                continue
+            if _PEM_BODY_LINE_RE.fullmatch(pieces[index]):
+                body_start = offset
+            elif index != len(pieces) - 1 or pieces[index].strip():
+                break
+
+        parts.append(content[position:body_start])
+        parts.append("******")
+        position = match.end()
+
+    if not parts:
+        return content
+    parts.append(content[position:])
+    return "".join(parts)
+
+# Memory backed directory for the content handed to the TruffleHog binary, so the logs are not written to disk
+TEMP_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+# Secrets reported by the TruffleHog binary, one "Raw result: <secret>" line per finding
+_RAW_RESULT_RE = re.compile(r'^\s*Raw result:\s*(.+?)\s*$', re.MULTILINE)
 
 class TruffleHogCensor:
-    def __init__(self):
-        self.censored_content = ""
+    def __init__(self, use_trufflehog_binary: bool = False):
+        """
+        Initialize the TruffleHogCensor.
+
+        Parameters:
+            use_trufflehog_binary (bool): Whether to additionally scan the content with the TruffleHog binary.
+                Defaults to False, in which case only the in-process credential patterns are applied.
+        """
+        self.use_trufflehog_binary = use_trufflehog_binary
 
     def censor_data(self, content: str) -> str:
         """
-        Scans for credentials in the provided content using TruffleHog and redacts sensitive information.
+        Scans for credentials in the provided content and redacts sensitive information.
 
         Parameters:
             content (str): The string content to scan for credentials.
@@ -19,15 +110,30 @@ class TruffleHogCensor:
         Returns:
             str: The content with sensitive information redacted.
         """
-        self.censored_content = content  # Store the original content
+        censored_content = _redact_private_key_bodies(_SECRET_PATTERNS.sub("******", content))
+
+        if self.use_trufflehog_binary:
+            censored_content = self._scan_with_trufflehog(censored_content)
 
-        # Create a temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.txt') as temp_file:
-            temp_file.write(content.encode('utf-8'))
+        return censored_content
+
+    def _scan_with_trufflehog(self, content: str) -> str:
+        """
+        Scans for credentials in the provided content using the TruffleHog binary.
+
+        Parameters:
+            content (str): The string content to scan for credentials.
+
+        Returns:
+            str: The content with sensitive information redacted.
+        """
+        # The filesystem source skips symlinks such as /dev/stdin, hand it a regular file instead
+        with tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', dir=TEMP_DIR, suffix='.txt', delete=False) as temp_file:
+            temp_file.write(content)
             temp_file_path = temp_file.name
 
-        # Define the command to run TruffleHog
-        command = ["trufflehog", "filesystem", temp_file_path, "json"]
+        # Define the command to run TruffleHog, skipping the self-update check
+        command = ["trufflehog", "filesystem", temp_file_path, "--no-update"]
 
         try:
             # Running the command and capturing the output
@@ -35,38 +141,32 @@ class TruffleHogCensor:
             output = result.stdout
 
             # Process the output and redact sensitive information
-            self._process_trufflehog_output(output)
+            return self._process_trufflehog_output(output, content)
 
         except subprocess.CalledProcessError as e:
             logging.error("An error occurred during TruffleHog scan: %s", e.stderr)
             # You might want to raise an exception or handle it accordingly
             raise RuntimeError("TruffleHog scan failed") from e
-        
+
         finally:
             # Remove the temporary file after the scan is done
-            if os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
+            os.remove(temp_file_path)
 
-        return self.censored_content
-
-    def _process_trufflehog_output(self, output: str):
+    def _process_trufflehog_output(self, output: str, content: str) -> str:
         """
         Processes the output from TruffleHog and redacts the detected sensitive data.
 
         Parameters:
             output (str): The output from the TruffleHog command.
+            content (str): The scanned content.
 
         Returns:
-            None: Updates the self.censored_content directly.
+            str: The content with the detected sensitive data redacted.
         """
-        lines = output.splitlines()
-
-        # Process each line of the TruffleHog output
-        for line in lines:
-            line = line.strip()  # Remove leading/trailing whitespace
-            if line.startswith("Raw result:"):
-                # Extract the value after "Raw result:"
-                raw_result = line.split(":", 1)[1].strip()
+        secrets = {match.group(1) for match in _RAW_RESULT_RE.finditer(output)}
+        if not secrets:
+            return content
 
-                # Redact the sensitive information in the content
-                self.censored_content = self.censored_content.replace(raw_result, "******")
+        # Redact all secrets in a single pass, longest first so a secret containing another is redacted whole
+        secrets_pattern = re.compile('|'.join(re.escape(secret) for secret in sorted(secrets, key=len, reverse=True)))
+        return secrets_pattern.sub("******", content)